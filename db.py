@@ -0,0 +1,33 @@
+import sqlite3
+
+
+def open_db(path, **kwargs):
+    """
+    Function to open a SQLite database with tuned performance settings.
+
+    Args:
+        path (str): The path (or URI) of the database file.
+        **kwargs: Extra keyword arguments passed to sqlite3.connect.
+
+    Returns:
+        sqlite3.Connection: The configured connection.
+    """
+    # A larger statement cache keeps the repeatedly-run queries compiled
+    conn = sqlite3.connect(path, cached_statements=256, **kwargs)
+
+    # Incremental auto-vacuum lets large deletes hand freed pages back to
+    # the filesystem; it has to be set before the first statement - the
+    # WAL pragma below - creates the database file
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
+    # WAL avoids the double fsync of the rollback journal and lets readers
+    # run concurrently with the writer; NORMAL sync is safe under WAL
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+    # Keep temporary tables and a generous page cache in memory
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA mmap_size=268435456")
+
+    return conn
@@ -1,11 +1,46 @@
+import argparse
+import asyncio
+import atexit
+import concurrent.futures
+import hashlib
+import json
 import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from types import SimpleNamespace
 import feedparser
+import httpx
 import logging
-import threading
+import logging.handlers
 import configparser
-from openai import OpenAI
+from db import open_db
+import tiktoken
+from lxml import etree
+from openai import AsyncOpenAI, OpenAI
+from selectolax.parser import HTMLParser
 from dotenv import load_dotenv
 
+# The semantic cache is optional: it needs sqlite-vec and a local
+# embedding model, so the feature is skipped if they aren't installed
+try:
+    import sqlite_vec
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_CACHE = True
+except ImportError:
+    SEMANTIC_CACHE = False
+
+# Numba is optional too: when present, the SimHash fingerprint below is
+# JIT-compiled; otherwise a pure-Python version is used
+try:
+    import numba
+    import numpy as np
+    NUMBA = True
+except ImportError:
+    NUMBA = False
+
 load_dotenv()
 
 # Read the configuration file
@@ -15,17 +50,336 @@ config.read('rssfeeds.ini')
 AI_MODEL = os.getenv('AI_MODEL')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-# Initialize the OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Number of worker threads used to process feeds in parallel
+WORKERS = int(os.getenv('WORKERS', 4))
+
+# Days to keep stored stories before they're purged
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', 30))
+
+# Maximum number of summarization requests in flight at once, to stay
+# within the OpenAI rate limits
+MAX_CONCURRENT_SUMMARIES = 8
+
+# Maximum number of tokens from a description sent to the API
+MAX_PROMPT_TOKENS = 1500
+
+# System message sent with every summarization request, built once so
+# each call only has to create the small user message
+SYSTEM_MSG = {
+    "role": "system",
+    "content": "You are a highly skilled AI trained in language comprehension and summarization. I would "
+               "like you to read the following text and summarize it into a concise abstract paragraph. "
+               "Aim to retain the most important points, providing a coherent and readable summary that "
+               "could help a person understand the main points of the discussion without needing to read "
+               "the entire text. Please avoid unnecessary details or tangential points."
+}
+
+# Tokenizer matching AI_MODEL, built once because encoding_for_model is
+# expensive; unknown models fall back to the common cl100k_base encoding
+try:
+    encoder = tiktoken.encoding_for_model(AI_MODEL)
+except (KeyError, AttributeError):
+    encoder = tiktoken.get_encoding('cl100k_base')
+
+# Initialize the OpenAI client with a shared HTTP/2 client so concurrent
+# summarization calls multiplex over warm connections instead of paying a
+# TLS handshake each time
+client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    http_client=httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=64),
+        timeout=30.0,
+    ),
+)
+
+# Shared HTTP session for fetching feeds, so TCP connections are reused
+# across feeds hosted on the same server; HTTP/2 lets feeds behind the
+# same CDN multiplex over a single connection, and advertising compression
+# shrinks the transfer
+session = httpx.Client(
+    http2=True,
+    headers={'Accept-Encoding': 'gzip, br', 'User-Agent': 'NetNews/1.0'},
+    timeout=30.0,
+    follow_redirects=True,
+)
+
+# Path to the SQLite database used to cache summaries between runs
+DB_PATH = os.getenv('NETNEWS_DB', 'netnews.db')
+
+# Maximum cosine distance for two descriptions to count as the same story
+SEMANTIC_DISTANCE = 0.05
+
+# Semantic cache entries older than this many seconds are considered stale
+SEMANTIC_TTL = 7 * 24 * 3600
+
+# The embedding model is loaded lazily on first use
+_embedder = None
+
+# Each thread gets its own connection, because a sqlite3.Connection must
+# not be used from two threads at once
+_tls = threading.local()
+
+
+def get_conn():
+    """
+    Function to get the calling thread's database connection.
+
+    Connections are opened lazily, one per thread; WAL (set in open_db)
+    is what lets them read and write concurrently. Shared-cache mode is
+    deliberately not used: colliding writers there fail immediately with
+    SQLITE_LOCKED, which the busy timeout does not retry.
+
+    Returns:
+        sqlite3.Connection: The thread-local connection.
+    """
+    if not hasattr(_tls, 'conn'):
+        _tls.conn = open_db(DB_PATH)
+        if SEMANTIC_CACHE:
+            # Every connection needs the sqlite-vec extension loaded
+            _tls.conn.enable_load_extension(True)
+            sqlite_vec.load(_tls.conn)
+            _tls.conn.enable_load_extension(False)
+    return _tls.conn
+
+
+def init_db():
+    """
+    Function to create the database tables if they don't exist yet.
+
+    Returns:
+        None
+    """
+    conn = get_conn()
+
+    # Databases created before open_db configured incremental auto-vacuum
+    # report 0 here; changing the mode on an existing file only takes
+    # effect after a one-time rebuild, and without it the
+    # incremental_vacuum in cleanup_old_entries would be a no-op
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+
+    conn.execute("CREATE TABLE IF NOT EXISTS summary_cache(h BLOB PRIMARY KEY, summary TEXT, ts INTEGER)")
+    conn.execute("CREATE TABLE IF NOT EXISTS news("
+                 "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                 "feed TEXT, title TEXT, link TEXT, summary TEXT, "
+                 "created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_news_date_feed ON news(created_date, feed)")
+    conn.execute("CREATE TABLE IF NOT EXISTS simhash_cache(sh INTEGER PRIMARY KEY, summary TEXT, ts INTEGER)")
+    conn.execute("CREATE TABLE IF NOT EXISTS feed_meta(name TEXT PRIMARY KEY, etag TEXT, modified TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS batch_jobs(batch_id TEXT PRIMARY KEY, submitted INTEGER)")
+    conn.execute("CREATE TABLE IF NOT EXISTS pending_stories("
+                 "custom_id TEXT, batch_id TEXT, feed TEXT, title TEXT, link TEXT, h BLOB, "
+                 "PRIMARY KEY(custom_id, batch_id))")
+    if SEMANTIC_CACHE:
+        # The vector index sits alongside a mirror table holding the
+        # cached summaries
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS vec_cache "
+                     "USING vec0(embedding float[384] distance_metric=cosine)")
+        conn.execute("CREATE TABLE IF NOT EXISTS vec_summaries(rowid INTEGER PRIMARY KEY, summary TEXT, ts INTEGER)")
+    conn.commit()
+
+
+init_db()
+
+
+def embed(text):
+    """
+    Function to embed a text with a small local model.
+
+    Args:
+        text (str): The text to embed.
+
+    Returns:
+        bytes: The embedding serialized for sqlite-vec.
+    """
+    global _embedder
+    if _embedder is None:
+        _embedder = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+    return sqlite_vec.serialize_float32(_embedder.encode(text, normalize_embeddings=True))
 
 # Initialize an empty list to store the summaries
 summaries = []
 
+def setup_logging():
+    """
+    Function to configure logging through a background queue.
+
+    Worker threads hand records to an in-memory queue and return
+    immediately; a single listener thread owns the log file, so logging
+    never blocks a worker on disk I/O.
+
+    Returns:
+        None
+    """
+    log_queue = queue.Queue(-1)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, logging.FileHandler('app.log'))
+    listener.start()
+
+    # Flush any queued records when the process exits
+    atexit.register(listener.stop)
+
+
 # Set up logging
-logging.basicConfig(filename='app.log', level=logging.INFO)
+setup_logging()
+
+
+if NUMBA:
+    @numba.njit(cache=True, nogil=True)
+    def _simhash_u8(buf):
+        v = np.zeros(64, dtype=np.int64)
+        for i in range(buf.shape[0] - 3):
+            # FNV-1a over a 4-byte shingle
+            h = np.uint64(14695981039346656037)
+            for j in range(4):
+                h = np.uint64(h ^ np.uint64(buf[i + j]))
+                h = np.uint64(h * np.uint64(1099511628211))
+            for b in range(64):
+                if (h >> np.uint64(b)) & np.uint64(1):
+                    v[b] += 1
+                else:
+                    v[b] -= 1
+        out = np.uint64(0)
+        for b in range(64):
+            if v[b] > 0:
+                out |= np.uint64(1) << np.uint64(b)
+        return out
+else:
+    def _simhash_u8(buf):
+        v = [0] * 64
+        for i in range(len(buf) - 3):
+            # FNV-1a over a 4-byte shingle
+            h = 14695981039346656037
+            for j in range(4):
+                h = ((h ^ buf[i + j]) * 1099511628211) & 0xFFFFFFFFFFFFFFFF
+            for b in range(64):
+                if (h >> b) & 1:
+                    v[b] += 1
+                else:
+                    v[b] -= 1
+        out = 0
+        for b in range(64):
+            if v[b] > 0:
+                out |= 1 << b
+        return out
+
+
+def simhash(text):
+    """
+    Function to compute a 64-bit SimHash fingerprint of a text.
+
+    Texts that differ only in small wording or markup details produce
+    the same fingerprint far more often than a cryptographic hash would,
+    making it a cheap near-duplicate key. With Numba installed the
+    kernel is JIT-compiled and releases the GIL.
 
+    Args:
+        text (str): The text to fingerprint.
+
+    Returns:
+        int: The fingerprint as a signed 64-bit integer, ready for SQLite.
+    """
+    data = text.encode()
+    if len(data) < 4:
+        return 0
+
+    if NUMBA:
+        sh = int(_simhash_u8(np.frombuffer(data, dtype=np.uint8)))
+    else:
+        sh = _simhash_u8(data)
+
+    # SQLite integers are signed 64-bit
+    if sh >= 1 << 63:
+        sh -= 1 << 64
+    return sh
+
+
+def clean_text(text):
+    """
+    Function to strip HTML markup from a feed description.
+
+    Descriptions routinely carry tags, tracking boilerplate and inline
+    markup, all of which would be billed as tokens; only the visible
+    text is worth summarizing.
+
+    Args:
+        text (str): The raw description, possibly containing HTML.
+
+    Returns:
+        str: The plain text.
+    """
+    return HTMLParser(text).text(separator=' ', strip=True)
 
-def get_summary(text):
+
+def truncate_tokens(text):
+    """
+    Function to trim a text to the model's token budget.
+
+    Slicing tokens rather than characters matches what the API actually
+    bills and avoids over-cutting multi-byte text.
+
+    Args:
+        text (str): The text to trim.
+
+    Returns:
+        str: The text, cut to at most MAX_PROMPT_TOKENS tokens.
+    """
+    tokens = encoder.encode(text)
+    if len(tokens) > MAX_PROMPT_TOKENS:
+        text = encoder.decode(tokens[:MAX_PROMPT_TOKENS])
+    return text
+
+
+def filter_new_entries(conn, entries):
+    """
+    Function to drop entries whose titles are already in the news table.
+
+    All the titles are checked in a single batched query instead of one
+    SELECT per entry.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        entries (list): The feed entries to check.
+
+    Returns:
+        list: The entries not yet stored.
+    """
+    titles = [entry.title for entry in entries]
+    existing = set()
+    if titles:
+        placeholders = ','.join('?' * len(titles))
+        existing = {row[0] for row in
+                    conn.execute(f"SELECT title FROM news WHERE title IN ({placeholders})", titles)}
+    return [entry for entry in entries if entry.title not in existing]
+
+
+def record_story(feed_name, title, link, summary):
+    """
+    Function to append a summarized story to the output file.
+
+    Args:
+        feed_name (str): The name of the RSS feed.
+        title (str): The story's title.
+        link (str): The story's link.
+        summary (str): The generated summary.
+
+    Returns:
+        None
+    """
+    with open('TodaysNetNews.txt', 'a') as f:
+        f.write(f"Feed: {feed_name}\nTitle: {title}\nLink: {link}\nSummary: {summary}\n---\n")
+
+    # Add the summary to the list
+    summaries.append(f"Feed: {feed_name}\nTitle: {title}\nLink: {link}\nSummary: {summary}\n---\n")
+
+
+async def get_summary(text):
     """
     Function to summarize a text using AI.
 
@@ -35,81 +389,517 @@ def get_summary(text):
     Returns:
         str: The summarized text or None if an error occurred.
     """
+    # Strip markup, then trim to the model's token budget
+    text = truncate_tokens(clean_text(text))
+
+    conn = get_conn()
+
+    # One cursor serves all the statements below
+    c = conn.cursor()
+
+    # Check the cache first: identical descriptions show up when the same
+    # story is syndicated across feeds, or when the script is re-run
+    h = hashlib.sha256(text.encode()).digest()
+    row = c.execute("SELECT summary FROM summary_cache WHERE h=?", (h,)).fetchone()
+    if row is not None:
+        return row[0]
+
+    # Next, try the SimHash fingerprint, which collapses small wording and
+    # markup differences at a fraction of the cost of an embedding
+    sh = simhash(text)
+    row = c.execute("SELECT summary, ts FROM simhash_cache WHERE sh=?", (sh,)).fetchone()
+    if row is not None and time.time() - row[1] < SEMANTIC_TTL:
+        return row[0]
+
+    # Fall back to the semantic cache, which also catches the same story
+    # phrased slightly differently by different outlets
+    embedding = None
+    if SEMANTIC_CACHE:
+        embedding = embed(text)
+        match = c.execute("SELECT rowid, distance FROM vec_cache WHERE embedding MATCH ? AND k = 1",
+                          (embedding,)).fetchone()
+        if match is not None and match[1] <= SEMANTIC_DISTANCE:
+            cached = c.execute("SELECT summary, ts FROM vec_summaries WHERE rowid=?", (match[0],)).fetchone()
+            if cached is not None and time.time() - cached[1] < SEMANTIC_TTL:
+                return cached[0]
+
     try:
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model=AI_MODEL,
-            messages=[
-                {"role": "system",
-                 "content": "You are a highly skilled AI trained in language comprehension and summarization. I would "
-                            "like you to read the following text and summarize it into a concise abstract paragraph. "
-                            "Aim to retain the most important points, providing a coherent and readable summary that "
-                            "could help a person understand the main points of the discussion without needing to read "
-                            "the entire text. Please avoid unnecessary details or tangential points."},
-                {"role": "user", "content": text}
-            ])
-        return response.choices[0].message.content
+            messages=[SYSTEM_MSG, {"role": "user", "content": text}])
+        summary = response.choices[0].message.content
+
+        # Remember the summary so the same description never hits the API twice
+        c.execute("INSERT OR IGNORE INTO summary_cache(h, summary, ts) VALUES (?, ?, ?)",
+                  (h, summary, int(time.time())))
+        c.execute("INSERT OR IGNORE INTO simhash_cache(sh, summary, ts) VALUES (?, ?, ?)",
+                  (sh, summary, int(time.time())))
+
+        # Index the embedding so near-duplicate descriptions hit the cache too
+        if SEMANTIC_CACHE and embedding is not None:
+            c.execute("INSERT INTO vec_cache(embedding) VALUES (?)", (embedding,))
+            c.execute("INSERT INTO vec_summaries(rowid, summary, ts) VALUES (?, ?, ?)",
+                      (c.lastrowid, summary, int(time.time())))
+
+        conn.commit()
+
+        return summary
     except Exception as e:
         logging.error(f"Error summarizing text: {e}")
         return None
 
 
-def generate_summaries(feed_name, feed_url, num_stories):
+def parse_feed(feed_data):
+    """
+    Function to extract the entries from a raw feed document.
+
+    Uses lxml's C parser for the common RSS/Atom layout, which is several
+    times faster than feedparser's pure-Python parser, and falls back to
+    feedparser for documents it can't make sense of.
+
+    Args:
+        feed_data (bytes): The raw feed document returned by fetch_feed.
+
+    Returns:
+        list: The feed entries, each with title, link and description.
+    """
+    try:
+        entries = []
+        for _, element in etree.iterparse(BytesIO(feed_data), events=('end',),
+                                          tag=('{*}item', '{*}entry'), recover=True):
+            title = link = description = None
+            for child in element:
+                if not isinstance(child.tag, str):
+                    continue
+                tag = etree.QName(child).localname
+                if tag == 'title':
+                    title = (child.text or '').strip()
+                elif tag == 'link':
+                    # RSS puts the URL in the text, Atom in the href
+                    # attribute; ignore Atom rel="self"/"edit" links so
+                    # they can't overwrite the story URL
+                    if child.get('rel') in (None, 'alternate'):
+                        link = (child.text or child.get('href') or '').strip()
+                elif tag in ('description', 'summary', 'content') and not description:
+                    # itertext() walks child nodes as well, so Atom
+                    # <content type="xhtml"> bodies (whose text lives in a
+                    # nested div, not in child.text) are captured too; the
+                    # 'not description' guard keeps an element that still
+                    # comes up empty from masking a later candidate
+                    description = ''.join(child.itertext()).strip()
+
+            if title and description:
+                entries.append(SimpleNamespace(title=title, link=link or '', description=description))
+
+            # Release the element so the document doesn't accumulate in memory
+            element.clear(keep_tail=True)
+
+        if entries:
+            return entries
+    except etree.XMLSyntaxError as e:
+        logging.warning(f"lxml could not parse feed, falling back to feedparser: {e}")
+
+    # feedparser is far more forgiving of malformed feeds
+    return feedparser.parse(feed_data).entries
+
+
+async def summarize_entries(entries):
+    """
+    Function to summarize a batch of feed entries concurrently.
+
+    Args:
+        entries (list): The feed entries to summarize.
+
+    Returns:
+        list: One summary (or None) per entry, in the same order.
+    """
+    # Bound the number of requests in flight to respect rate limits
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SUMMARIES)
+
+    async def sem_call(text):
+        async with semaphore:
+            return await get_summary(text)
+
+    # Fire all the summarization calls at once and wait for the results
+    return await asyncio.gather(*(sem_call(entry.description) for entry in entries))
+
+
+def fetch_feed(feed_name, feed_url):
     """
-    Function to fetch and parse RSS feed and generate summaries.
+    Function to download the raw bytes of an RSS feed.
+
+    Sends the ETag / Last-Modified validators remembered from the last
+    run, so feeds that haven't changed answer 304 and skip the download
+    and the parse entirely.
 
     Args:
         feed_name (str): The name of the RSS feed.
         feed_url (str): The URL of the RSS feed.
+
+    Returns:
+        bytes: The raw feed document, or None if the feed is unchanged.
+    """
+    conn = get_conn()
+
+    headers = {}
+    meta = conn.execute("SELECT etag, modified FROM feed_meta WHERE name=?", (feed_name,)).fetchone()
+    if meta is not None:
+        etag, modified = meta
+        if etag:
+            headers['If-None-Match'] = etag
+        if modified:
+            headers['If-Modified-Since'] = modified
+
+    response = session.get(feed_url, headers=headers)
+    if response.status_code == 304:
+        logging.info(f"Feed {feed_name} is unchanged, skipping")
+        return None
+    response.raise_for_status()
+
+    # Remember the validators for the next run
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO feed_meta(name, etag, modified) VALUES (?, ?, ?)",
+                     (feed_name, response.headers.get('ETag'), response.headers.get('Last-Modified')))
+
+    return response.content
+
+
+async def generate_summaries(feed_name, feed_data, num_stories):
+    """
+    Function to parse a fetched RSS feed and generate summaries.
+
+    Args:
+        feed_name (str): The name of the RSS feed.
+        feed_data (bytes): The raw feed document returned by fetch_feed.
         num_stories (int): The number of stories to summarize.
 
     Returns:
         None
     """
     try:
-        # Fetch and parse the RSS feed
-        feed = feedparser.parse(feed_url)
+        # Parse the previously fetched feed and take the first num_stories
+        # entries from it
+        entries = parse_feed(feed_data)[:num_stories]
+
+        conn = get_conn()
 
-        # Iterate through the entries in the fetched feed
-        for i, entry in enumerate(feed.entries):
-            # Break the loop after the specified number of stories
-            if i >= num_stories:
-                break
+        # Skip stories we've already stored
+        entries = filter_new_entries(conn, entries)
 
-            # Summarize the story's description using AI_MODEL
-            summary = get_summary(entry.description)
+        # Summarize all the selected stories concurrently
+        entry_summaries = await summarize_entries(entries)
+
+        rows = []
+        for entry, summary in zip(entries, entry_summaries):
             if summary is not None:
-                with open('TodaysNetNews.txt', 'a') as f:
-                    f.write(f"Feed: {feed_name}\nTitle: {entry.title}\nLink: {entry.link}\nSummary: {summary}\n---\n")
+                record_story(feed_name, entry.title, entry.link, summary)
+                rows.append((feed_name, entry.title, entry.link, summary))
 
-                # Add the summary to the list
-                summaries.append(
-                    f"Feed: {feed_name}\nTitle: {entry.title}\nLink: {entry.link}\nSummary: {summary}\n---\n")
+        # Store the whole feed in one transaction so SQLite syncs to disk
+        # once per feed instead of once per story
+        with conn:
+            conn.executemany("INSERT INTO news(feed, title, link, summary) VALUES (?, ?, ?, ?)", rows)
     except Exception as e:
         logging.error(f"Error fetching and parsing RSS feed: {e}")
 
 
-# Get the 'RSS_FEEDS' section
-rss_feeds_section = config['RSS_FEEDS']
+async def process_feeds(fetched):
+    """
+    Function to parse and summarize the fetched feeds one at a time.
+
+    The whole run shares a single event loop: the OpenAI client's pooled
+    connections belong to the loop they were opened in, so one loop per
+    feed would leave later feeds with dead keep-alive connections.
+
+    Args:
+        fetched (list): A list of (feed_name, feed_data, num_stories) tuples.
+
+    Returns:
+        None
+    """
+    for feed_name, feed_data, num_stories in fetched:
+        await generate_summaries(feed_name, feed_data, num_stories)
+
+
+def ingest_batches():
+    """
+    Function to collect the results of previously submitted batches.
+
+    Completed batches are downloaded and their summaries stored exactly
+    as if they had been generated synchronously; batches still in
+    progress are left for the next run.
+
+    Returns:
+        None
+    """
+    conn = get_conn()
+    sync_client = OpenAI(api_key=OPENAI_API_KEY)
+
+    for (batch_id,) in conn.execute("SELECT batch_id FROM batch_jobs").fetchall():
+        try:
+            batch = sync_client.batches.retrieve(batch_id)
+        except Exception as e:
+            logging.error(f"Error retrieving batch {batch_id}: {e}")
+            continue
+
+        if batch.status in ('failed', 'expired', 'cancelled'):
+            logging.error(f"Batch {batch_id} ended with status {batch.status}")
+            with conn:
+                conn.execute("DELETE FROM pending_stories WHERE batch_id=?", (batch_id,))
+                conn.execute("DELETE FROM batch_jobs WHERE batch_id=?", (batch_id,))
+            continue
+
+        if batch.status != 'completed':
+            logging.info(f"Batch {batch_id} is still {batch.status}")
+            continue
+
+        # A completed batch has no output file when every request in it
+        # failed; there's nothing to download in that case
+        if not batch.output_file_id:
+            logging.error(f"Batch {batch_id} completed without an output file")
+            with conn:
+                conn.execute("DELETE FROM pending_stories WHERE batch_id=?", (batch_id,))
+                conn.execute("DELETE FROM batch_jobs WHERE batch_id=?", (batch_id,))
+            continue
+
+        # A failure here must not kill the whole run; pending rows stay in
+        # place so the batch is retried on the next pass
+        try:
+            output = sync_client.files.content(batch.output_file_id).text
+
+            news_rows = []
+            cache_rows = []
+
+            # One cursor serves all the per-story lookups below
+            c = conn.cursor()
+            for line in output.splitlines():
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                if result.get('error'):
+                    logging.error(f"Batch item {result['custom_id']} failed: {result['error']}")
+                    continue
+
+                story = c.execute(
+                    "SELECT feed, title, link, h FROM pending_stories WHERE custom_id=? AND batch_id=?",
+                    (result['custom_id'], batch_id)).fetchone()
+                if story is None:
+                    continue
+
+                feed_name, title, link, h = story
+                summary = result['response']['body']['choices'][0]['message']['content']
+                record_story(feed_name, title, link, summary)
+                news_rows.append((feed_name, title, link, summary))
+                cache_rows.append((h, summary, int(time.time())))
+
+            # Store everything from this batch in one transaction
+            with conn:
+                conn.executemany("INSERT INTO news(feed, title, link, summary) VALUES (?, ?, ?, ?)", news_rows)
+                conn.executemany("INSERT OR IGNORE INTO summary_cache(h, summary, ts) VALUES (?, ?, ?)", cache_rows)
+                conn.execute("DELETE FROM pending_stories WHERE batch_id=?", (batch_id,))
+                conn.execute("DELETE FROM batch_jobs WHERE batch_id=?", (batch_id,))
+        except Exception as e:
+            logging.error(f"Error ingesting batch {batch_id}: {e}")
+
+
+def submit_batch(fetched):
+    """
+    Function to submit all uncached stories as a single OpenAI batch.
+
+    The Batch API processes requests asynchronously within 24 hours at
+    roughly half the token cost, which suits a cron job where nobody is
+    waiting on an individual story. Stories whose summaries are already
+    cached are stored immediately.
+
+    Args:
+        fetched (list): A list of (feed_name, feed_data, num_stories) tuples.
+
+    Returns:
+        None
+    """
+    conn = get_conn()
+
+    # One cursor serves all the per-story lookups below
+    c = conn.cursor()
+
+    requests_by_id = {}
+    pending_rows = []
+    news_rows = []
+
+    for feed_name, feed_data, num_stories in fetched:
+        # A bad feed must not abort the batch for the healthy ones, so
+        # each feed's work is isolated like in generate_summaries
+        try:
+            entries = filter_new_entries(conn, parse_feed(feed_data)[:num_stories])
+
+            for entry in entries:
+                # Feedparser-fallback entries may lack a description
+                description = getattr(entry, 'description', None)
+                if not description:
+                    continue
+
+                text = truncate_tokens(clean_text(description))
+                h = hashlib.sha256(text.encode()).digest()
+
+                # Cached stories don't need to go through the batch at all
+                row = c.execute("SELECT summary FROM summary_cache WHERE h=?", (h,)).fetchone()
+                if row is not None:
+                    record_story(feed_name, entry.title, entry.link, row[0])
+                    news_rows.append((feed_name, entry.title, entry.link, row[0]))
+                    continue
+
+                # Skip stories already waiting in an earlier batch
+                custom_id = h.hex()
+                if custom_id in requests_by_id or c.execute(
+                        "SELECT 1 FROM pending_stories WHERE custom_id=?", (custom_id,)).fetchone():
+                    continue
+
+                requests_by_id[custom_id] = {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": AI_MODEL,
+                        "messages": [SYSTEM_MSG, {"role": "user", "content": text}],
+                    },
+                }
+                pending_rows.append((custom_id, feed_name, entry.title, entry.link, h))
+        except Exception as e:
+            logging.error(f"Error preparing feed {feed_name} for the batch: {e}")
+
+    # Store any cache hits right away
+    if news_rows:
+        with conn:
+            conn.executemany("INSERT INTO news(feed, title, link, summary) VALUES (?, ?, ?, ?)", news_rows)
+
+    if not requests_by_id:
+        return
+
+    # Upload the request file and create the batch
+    payload = '\n'.join(json.dumps(r) for r in requests_by_id.values())
+    sync_client = OpenAI(api_key=OPENAI_API_KEY)
+    batch_file = sync_client.files.create(file=('netnews_batch.jsonl', payload.encode()), purpose='batch')
+    batch = sync_client.batches.create(input_file_id=batch_file.id,
+                                       endpoint='/v1/chat/completions',
+                                       completion_window='24h')
+
+    # Remember the batch so the next run can pick up the results
+    with conn:
+        conn.execute("INSERT INTO batch_jobs(batch_id, submitted) VALUES (?, ?)", (batch.id, int(time.time())))
+        conn.executemany("INSERT OR IGNORE INTO pending_stories(custom_id, batch_id, feed, title, link, h) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         [(custom_id, batch.id, feed_name, title, link, h)
+                          for custom_id, feed_name, title, link, h in pending_rows])
+
+    logging.info(f"Submitted batch {batch.id} with {len(requests_by_id)} stories")
+
+
+def cleanup_old_entries():
+    """
+    Function to purge stored stories older than RETENTION_DAYS.
+
+    After a large purge, freed pages are handed back to the filesystem
+    and the query planner statistics are refreshed so idx_news_date_feed
+    keeps being chosen as the table shrinks and grows.
+
+    Returns:
+        None
+    """
+    conn = get_conn()
+
+    # created_date defaults to CURRENT_TIMESTAMP, which is UTC, so the
+    # cutoff has to be computed in UTC as well
+    cutoff = (datetime.now(timezone.utc).date() - timedelta(days=RETENTION_DAYS)).isoformat()
+
+    # A plain range predicate keeps the delete sargable, like the web query
+    with conn:
+        deleted = conn.execute("DELETE FROM news WHERE created_date < ?", (cutoff,)).rowcount
+
+    if deleted > 0:
+        logging.info(f"Deleted {deleted} stories older than {cutoff}")
+
+    if deleted > 1000:
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("ANALYZE news")
+        conn.commit()
+
+
+def read_feeds():
+    """
+    Function to read the RSS feeds from the configuration file.
+
+    Returns:
+        list: A list of (feed_name, feed_url, num_stories) tuples.
+    """
+    # Get the 'RSS_FEEDS' section
+    rss_feeds_section = config['RSS_FEEDS']
+
+    # Initialize an empty list to store the RSS feeds
+    rss_feeds = []
+
+    # Loop through all the key-value pairs in the 'RSS_FEEDS' section
+    for key in rss_feeds_section:
+        # Split the value at the comma into the URL and the number of entries to summarize
+        url, num_entries = rss_feeds_section[key].split(',')
+        # Convert the number of entries to summarize to an integer
+        num_entries = int(num_entries)
+        # Add the RSS feed to the list
+        rss_feeds.append((key, url, num_entries))
+
+    return rss_feeds
+
+
+def main():
+    """
+    Function to process all configured RSS feeds using a bounded thread pool.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description='Summarize RSS feeds with AI.')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help='number of feed download threads (default: WORKERS env or 4)')
+    parser.add_argument('--batch', action='store_true',
+                        help='summarize through the OpenAI Batch API at ~half the token '
+                             'cost; results are stored on the next run')
+    args = parser.parse_args()
+
+    rss_feeds = read_feeds()
+
+    # Collect the results of any batches submitted by earlier runs
+    if args.batch:
+        ingest_batches()
+
+    # Stage 1: download the feeds in parallel. Only the network fetch runs
+    # in the pool; the work is I/O-bound so a small pool of threads
+    # collapses the total wall time to roughly the slowest feed.
+    fetched = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(fetch_feed, feed_name, feed_url): (feed_name, num_stories)
+            for feed_name, feed_url, num_stories in rss_feeds
+        }
+
+        # Collect the downloaded feeds and log any errors
+        for future in concurrent.futures.as_completed(futures):
+            feed_name, num_stories = futures[future]
+            try:
+                feed_data = future.result()
+                if feed_data is not None:
+                    fetched.append((feed_name, feed_data, num_stories))
+            except Exception as e:
+                logging.error(f"Error fetching feed {feed_name}: {e}")
 
-# Initialize an empty list to store the RSS feeds
-rss_feeds = []
+    # Stage 2: parse and summarize one feed at a time in the main thread,
+    # so only one parsed feed document is held in memory at once.
+    if args.batch:
+        submit_batch(fetched)
+    else:
+        asyncio.run(process_feeds(fetched))
 
-# Loop through all the key-value pairs in the 'RSS_FEEDS' section
-for key in rss_feeds_section:
-    # Split the value at the comma into the URL and the number of entries to summarize
-    url, num_entries = rss_feeds_section[key].split(',')
-    # Convert the number of entries to summarize to an integer
-    num_entries = int(num_entries)
-    # Add the RSS feed to the list
-    rss_feeds.append((key, url, num_entries))
+    # Purge stories that have aged out of the reader
+    cleanup_old_entries()
 
-# Create a thread for each RSS feed
-threads = []
-for feed_name, feed_url, num_stories in rss_feeds:
-    thread = threading.Thread(target=generate_summaries, args=(feed_name, feed_url, num_stories))
-    threads.append(thread)
-    thread.start()
 
-# Wait for all threads to finish
-for thread in threads:
-    thread.join()
+if __name__ == '__main__':
+    main()
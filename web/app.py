@@ -0,0 +1,131 @@
+import atexit
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from flask import Flask, g, make_response, render_template_string, request
+
+# db.py lives at the repository root, which isn't on sys.path when this
+# file is run directly as 'python web/app.py'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import open_db
+
+# Path to the SQLite database written by main.py
+DB_PATH = os.getenv('NETNEWS_DB', 'netnews.db')
+
+app = Flask(__name__)
+
+# One long-lived read-only connection per worker process; reconnecting on
+# every request would repeat the open and PRAGMA cost and throw away the
+# page cache each time
+_conn = None
+
+
+def _get_db():
+    """
+    Function to get the worker's shared database connection.
+
+    Returns:
+        sqlite3.Connection: The read-only connection.
+    """
+    global _conn
+    if _conn is None:
+        _conn = open_db(DB_PATH, check_same_thread=False)
+        _conn.execute("PRAGMA query_only=1")
+        # The connection lives for the whole process; close it at shutdown
+        atexit.register(_conn.close)
+    return _conn
+
+
+@app.before_request
+def attach_db():
+    """
+    Function to expose the shared connection on the request context.
+
+    Returns:
+        None
+    """
+    g.db = _get_db()
+
+# Rendered HTML cached per day, as {date: (etag, html)}; the rows change
+# at most a few times a day so re-rendering per request is wasted work
+_page_cache = {}
+
+# Simple inline template listing today's summaries
+PAGE = """<!doctype html>
+<html lang="en">
+<head>
+    <meta charset="utf-8">
+    <title>Today's Net News</title>
+</head>
+<body>
+    <h1>Today's Net News &mdash; {{ today }}</h1>
+    {% for id, feed, title, link, summary in rows %}
+    <article>
+        <h2><a href="{{ link }}">{{ title }}</a></h2>
+        <p><em>{{ feed }}</em></p>
+        <p>{{ summary }}</p>
+    </article>
+    <hr>
+    {% else %}
+    <p>No news yet today.</p>
+    {% endfor %}
+</body>
+</html>
+"""
+
+
+@app.route('/')
+def hello_world():
+    """
+    Function to render today's summaries from the news table.
+
+    Returns:
+        Response: The rendered HTML page, or a 304 if the client is current.
+    """
+    # created_date defaults to CURRENT_TIMESTAMP, which is UTC, so the
+    # day boundary has to be computed in UTC as well
+    today = datetime.now(timezone.utc).date()
+    tomorrow = today + timedelta(days=1)
+
+    conn = g.db
+
+    # The newest row id for today doubles as a weak ETag: it only
+    # changes when new summaries have been written
+    max_id = conn.execute(
+        "SELECT MAX(id) FROM news WHERE created_date >= ? AND created_date < ?",
+        (today.isoformat(), tomorrow.isoformat())).fetchone()[0]
+    # The date is part of the tag: a bare row id would make an empty page
+    # revalidate against yesterday's empty page and serve a stale heading
+    etag = f'W/"{today}-{max_id or 0}"'
+
+    # The client already has the current page
+    if request.headers.get('If-None-Match') == etag:
+        return '', 304
+
+    cached = _page_cache.get(today)
+    if cached is not None and cached[0] == etag:
+        html = cached[1]
+    else:
+        # A half-open range on created_date keeps the query sargable, so
+        # SQLite range-scans idx_news_date_feed instead of running date()
+        # over every row; only the displayed columns are selected
+        rows = conn.execute(
+            "SELECT id, feed, title, link, summary FROM news "
+            "WHERE created_date >= ? AND created_date < ? "
+            "ORDER BY id DESC",
+            (today.isoformat(), tomorrow.isoformat())).fetchall()
+        html = render_template_string(PAGE, rows=rows, today=today)
+
+        # Keep only the current day's page in the cache
+        _page_cache.clear()
+        _page_cache[today] = (etag, html)
+
+    response = make_response(html)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response
+
+
+if __name__ == '__main__':
+    app.run()